@@ -0,0 +1,221 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Hashable, Optional
+from backend.config import CACHE_DB_PATH, SHARED_CACHE_ENABLED
+
+
+class TTLCache:
+    """
+    Small in-process cache. Entries are fresh for `ttl` seconds and are kept
+    for a further `max_stale` seconds so callers can fall back to them when
+    the upstream is unavailable.
+    """
+
+    def __init__(self, ttl: float, max_stale: float = 0, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, allow_stale: bool = False, max_age: Optional[float] = None) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        age = time.monotonic() - stored_at
+        fresh_for = self.ttl if max_age is None else min(self.ttl, max_age)
+        if age <= fresh_for or (allow_stale and age <= self.ttl + self.max_stale):
+            return value
+        return None
+
+    def age(self, key: Hashable) -> Optional[float]:
+        """Seconds since `key` was stored, or None if it isn't cached."""
+        with self._lock:
+            entry = self._data.get(key)
+        return None if entry is None else time.monotonic() - entry[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            if len(self._data) >= self.max_entries:
+                self._prune()
+            self._data[key] = (time.monotonic(), value)
+
+    def _prune(self) -> None:
+        """Drop dead entries, then the oldest ones if still over capacity."""
+        cutoff = time.monotonic() - self.ttl - self.max_stale
+        self._data = {k: v for k, v in self._data.items() if v[0] >= cutoff}
+        overflow = len(self._data) - self.max_entries + 1
+        if overflow > 0:
+            for key in sorted(self._data, key=lambda k: self._data[k][0])[:overflow]:
+                del self._data[key]
+
+
+_shared_local = threading.local()
+
+def shared_connection(path: str = CACHE_DB_PATH) -> sqlite3.Connection:
+    """
+    This thread's autocommit connection to the host-wide shared store,
+    creating its tables on first use.
+    """
+    conns = getattr(_shared_local, "conns", None)
+    if conns is None:
+        conns = _shared_local.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # losing the cache on power loss is fine
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace   TEXT NOT NULL,
+                key         TEXT NOT NULL,
+                value       TEXT NOT NULL,
+                stored_at   REAL NOT NULL,
+                fresh_until REAL NOT NULL,
+                expires_at  REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            ) WITHOUT ROWID
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS token_buckets (
+                name    TEXT PRIMARY KEY,
+                tokens  REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS leases (
+                name       TEXT PRIMARY KEY,
+                holder     TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conns[path] = conn
+    return conn
+
+
+class SharedCache:
+    """
+    TTLCache-compatible store in a SQLite file that every worker process on
+    the host reads and writes. Keys and values must be JSON-serialisable.
+    Each write is a single upsert, so readers never see a half-written entry.
+    """
+
+    _PRUNE_EVERY = 256
+
+    def __init__(self, namespace: str, ttl: float, max_stale: float = 0, path: str = CACHE_DB_PATH):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.path = path
+        self._writes = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        return shared_connection(self.path)
+
+    @staticmethod
+    def _key(key: Hashable) -> str:
+        return json.dumps(key, separators=(",", ":"))
+
+    def get(self, key: Hashable, allow_stale: bool = False, max_age: Optional[float] = None) -> Optional[Any]:
+        row = self._conn().execute(
+            "SELECT value, stored_at, fresh_until, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+            (self.namespace, self._key(key)),
+        ).fetchone()
+        if row is None:
+            return None
+        value, stored_at, fresh_until, expires_at = row
+        now = time.time()
+        if max_age is not None:
+            fresh_until = min(fresh_until, stored_at + max_age)
+        if now <= fresh_until or (allow_stale and now <= expires_at):
+            return json.loads(value)
+        return None
+
+    def age(self, key: Hashable) -> Optional[float]:
+        row = self._conn().execute(
+            "SELECT stored_at FROM cache_entries WHERE namespace = ? AND key = ?",
+            (self.namespace, self._key(key)),
+        ).fetchone()
+        return None if row is None else time.time() - row[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            """
+            INSERT INTO cache_entries (namespace, key, value, stored_at, fresh_until, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (namespace, key) DO UPDATE SET
+                value = excluded.value,
+                stored_at = excluded.stored_at,
+                fresh_until = excluded.fresh_until,
+                expires_at = excluded.expires_at
+            """,
+            (self.namespace, self._key(key), json.dumps(value), now, now + self.ttl, now + self.ttl + self.max_stale),
+        )
+        self._writes += 1
+        if self._writes % self._PRUNE_EVERY == 0:
+            conn.execute("DELETE FROM cache_entries WHERE expires_at < ?", (now,))
+
+
+def acquire_lease(name: str, holder: str, ttl: float) -> bool:
+    """
+    Take or renew the host-wide lease `name` for `ttl` seconds. Succeeds
+    when nobody holds it, `holder` already does, or the holder let it expire.
+    """
+    now = time.time()
+    cur = shared_connection().execute(
+        """
+        INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?)
+        ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+         WHERE leases.holder = excluded.holder OR leases.expires_at < ?
+        """,
+        (name, holder, now + ttl, now),
+    )
+    return cur.rowcount > 0
+
+
+def release_lease(name: str, holder: str) -> None:
+    shared_connection().execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder))
+
+
+def make_cache(namespace: str, ttl: float, max_stale: float = 0, max_entries: int = 1024):
+    """Shared cache when enabled, otherwise a per-process TTLCache with the same interface."""
+    if SHARED_CACHE_ENABLED:
+        return SharedCache(namespace, ttl, max_stale=max_stale)
+    return TTLCache(ttl, max_stale=max_stale, max_entries=max_entries)
+
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key into one execution."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event(), "value": None, "error": None}
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["value"]
+        try:
+            call["value"] = fn()
+            return call["value"]
+        except Exception as exc:
+            call["error"] = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
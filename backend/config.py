@@ -7,4 +7,59 @@ LLM_API_KEY = os.getenv("GEMINI_API_KEY")
 
 DB_PATH = 'weather_app.db'
 TABLE_NAME = 'history'
+# Cache shared by every uvicorn worker on the host; safe to delete at any time
+CACHE_DB_PATH = os.path.join(os.path.dirname(DB_PATH), 'weather_cache.db')
+SHARED_CACHE_ENABLED = os.getenv("SHARED_CACHE_ENABLED", "1") == "1"
+# History writes invalidate stats immediately; the TTL only bounds cache size
+HISTORY_STATS_TTL = 86400
 BASE_URL = "https://api.openweathermap.org/data/2.5"
+# Forecast projection used when `format` is given without `fields`
+FORECAST_DEFAULT_FIELDS = ("dt", "main.temp")
+
+# Upstream quotas (requests per minute) and how long a caller may wait for a token
+OPENWEATHER_RATE_PER_MIN = int(os.getenv("OPENWEATHER_RATE_PER_MIN", "60"))
+GEMINI_RATE_PER_MIN = int(os.getenv("GEMINI_RATE_PER_MIN", "15"))
+QUOTA_MAX_WAIT_SECONDS = float(os.getenv("QUOTA_MAX_WAIT_SECONDS", "2.0"))
+# Share of each bucket that only interactive requests may spend
+QUOTA_INTERACTIVE_RESERVE = 0.25
+
+# Weather response cache (seconds); stale entries are kept as a quota fallback
+WEATHER_CACHE_TTL = 600
+WEATHER_CACHE_MAX_STALE = 3600
+
+# Upstream latency guards
+UPSTREAM_TIMEOUT = (3.05, float(os.getenv("UPSTREAM_READ_TIMEOUT", "5")))  # (connect, read) seconds
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "10"))
+HEDGE_REQUESTS = os.getenv("HEDGE_REQUESTS", "1") == "1"
+HEDGE_PERCENTILE = 0.95
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MAX_IN_FLIGHT = int(os.getenv("HEDGE_MAX_IN_FLIGHT", "4"))
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_SECONDS = 30
+
+# Spatial cache keys: geohash length 6 is a ~1.2km x 0.6km cell
+GEOHASH_PRECISION = 6
+PLACE_INDEX_TTL = 7 * 86400
+
+# Cache pre-warming of popular locations
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "1") == "1"
+PREWARM_TOP_N = int(os.getenv("PREWARM_TOP_N", "20"))
+PREWARM_INTERVAL_SECONDS = 60
+PREWARM_BUDGET_PER_CYCLE = int(os.getenv("PREWARM_BUDGET_PER_CYCLE", "10"))  # upstream calls
+PREWARM_REFRESH_AT = 0.8  # refresh once an entry has used this share of its TTL
+PREWARM_REQUEST_WINDOW_SECONDS = 3600
+
+# Live weather stream (/weather/stream)
+LIVE_POLL_SECONDS = int(os.getenv("LIVE_POLL_SECONDS", "60"))
+LIVE_KEEPALIVE_SECONDS = 15
+LIVE_MAX_CITIES = 20
+
+# Optional write-behind batching of history inserts (group commit)
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "0") == "1"
+WRITE_BEHIND_MAX_BATCH = 64
+WRITE_BEHIND_MAX_DELAY_MS = 5
+
+# Observation store: raw samples roll up to hourly, hourly to daily
+OBS_RAW_RETENTION_DAYS = int(os.getenv("OBS_RAW_RETENTION_DAYS", "7"))
+OBS_HOURLY_RETENTION_DAYS = int(os.getenv("OBS_HOURLY_RETENTION_DAYS", "90"))
+OBS_MAINTENANCE_INTERVAL_SECONDS = 600
@@ -1,7 +1,18 @@
 import sqlite3
 from contextlib import contextmanager
-from backend.config import DB_PATH, TABLE_NAME
-import json
+from backend.cache import make_cache
+from backend.config import DB_PATH, TABLE_NAME, HISTORY_STATS_TTL
+
+# Stats are cached per database instance and history version; triggers bump the version on every write
+_stats_cache = make_cache("history_stats", ttl=HISTORY_STATS_TTL)
+
+STATS_BUCKETS = {
+    "none": "'all'",
+    "day": "date(day)",
+    "month": "strftime('%Y-%m', day)",
+    "year": "strftime('%Y', day)",
+}
+
 @contextmanager
 def get_connection():
     """Context manager for SQLite database connection."""
@@ -26,17 +37,48 @@ def create_table():
                 data TEXT
             )
         """)
+        # instance is random per database file, so cached stats of a recreated
+        # database (whose version restarts at 0) are never served for it
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {TABLE_NAME}_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL,
+                instance TEXT
+            )
+        """)
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({TABLE_NAME}_version)")]
+        if "instance" not in columns:
+            conn.execute(f"ALTER TABLE {TABLE_NAME}_version ADD COLUMN instance TEXT")
+        conn.execute(f"INSERT OR IGNORE INTO {TABLE_NAME}_version (id, version) VALUES (1, 0)")
+        conn.execute(
+            f"UPDATE {TABLE_NAME}_version SET instance = lower(hex(randomblob(16))) WHERE id = 1 AND instance IS NULL"
+        )
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {TABLE_NAME}_version_{event.lower()}
+                AFTER {event} ON {TABLE_NAME}
+                BEGIN
+                    UPDATE {TABLE_NAME}_version SET version = version + 1 WHERE id = 1;
+                END
+            """)
 
 def create_record(record):
+    return {"id": create_records([record])[0]}
+
+def create_records(records) -> list:
+    """Insert several records in one transaction (one commit); returns their ids in order."""
     with get_connection() as conn:
-        cursor = conn.execute(
-            f"""
-            INSERT INTO {TABLE_NAME} (city, date_from, date_to, data)
-            VALUES (?, ?, ?, ?)
-            """,
-            (record.city, record.date_from, record.date_to, record.data)
-        )
-        return {"id": cursor.lastrowid}
+        ids = []
+        for record in records:
+            cursor = conn.execute(
+                f"""
+                INSERT INTO {TABLE_NAME} (city, date_from, date_to, data)
+                VALUES (?, ?, ?, ?)
+                """,
+                (record.city, record.date_from, record.date_to, record.data)
+            )
+            ids.append(cursor.lastrowid)
+        return ids
 
 def get_all_records():
     with get_connection() as conn:
@@ -78,3 +120,71 @@ def update_record_to_today(record_id: int, date_str: str, data_json: str) -> boo
             (date_str, date_str, data_json, record_id)
         )
         return cur.rowcount > 0
+
+def get_city_counts(limit: int):
+    """Most saved cities, as (city, record_count) pairs."""
+    with get_connection() as conn:
+        return conn.execute(
+            f"""
+            SELECT city, COUNT(*) AS n
+              FROM {TABLE_NAME}
+             GROUP BY city COLLATE NOCASE
+             ORDER BY n DESC
+             LIMIT ?
+            """,
+            (limit,)
+        ).fetchall()
+
+
+def get_history_stats(city=None, bucket="month", date_from=None, date_to=None):
+    """
+    Per-city temperature stats over saved records, grouped by time bucket
+    ("none", "day", "month" or "year") and stored unit. Point snapshots
+    contribute their temp; range records contribute each summarised day.
+    """
+    bucket_expr = STATS_BUCKETS[bucket]
+    with get_connection() as conn:
+        conn.execute("BEGIN")  # version and stats come from one snapshot
+        instance, version = conn.execute(
+            f"SELECT instance, version FROM {TABLE_NAME}_version WHERE id = 1"
+        ).fetchone()
+        key = (instance, version, city and city.lower(), bucket, date_from, date_to)
+        cached = _stats_cache.get(key)
+        if cached is not None:
+            return cached
+
+        rows = conn.execute(
+            f"""
+            WITH samples AS (
+                SELECT id, city, date_from AS day, json_extract(data, '$.unit') AS unit,
+                       json_extract(data, '$.temp') AS avg_t,
+                       json_extract(data, '$.temp') AS min_t,
+                       json_extract(data, '$.temp') AS max_t
+                  FROM {TABLE_NAME}
+                 WHERE json_valid(data) AND json_type(data, '$.temp') IN ('integer', 'real')
+                UNION ALL
+                SELECT h.id, h.city,
+                       json_extract(d.value, '$.date'),
+                       CASE WHEN json_type(h.data) = 'object' THEN json_extract(h.data, '$.unit') END,
+                       json_extract(d.value, '$.avg_temp'),
+                       json_extract(d.value, '$.min_temp'),
+                       json_extract(d.value, '$.max_temp')
+                  FROM {TABLE_NAME} h,
+                       json_each(h.data, CASE WHEN json_type(h.data) = 'array' THEN '$' ELSE '$.daily_summary' END) d
+                 WHERE json_valid(h.data)
+            )
+            SELECT MIN(city), {bucket_expr} AS bucket, COALESCE(unit, 'unknown'),
+                   COUNT(DISTINCT id), COUNT(*), AVG(avg_t), MIN(min_t), MAX(max_t)
+              FROM samples
+             WHERE (:city IS NULL OR city = :city COLLATE NOCASE)
+               AND (:date_from IS NULL OR date(day) >= :date_from)
+               AND (:date_to IS NULL OR date(day) <= :date_to)
+             GROUP BY city COLLATE NOCASE, bucket, unit
+             ORDER BY city COLLATE NOCASE, bucket
+            """,
+            {"city": city, "date_from": date_from, "date_to": date_to},
+        ).fetchall()
+        columns = ["city", "bucket", "unit", "records", "samples", "avg_temp", "min_temp", "max_temp"]
+        stats = [dict(zip(columns, row)) for row in rows]
+        _stats_cache.set(key, stats)
+        return stats
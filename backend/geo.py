@@ -0,0 +1,103 @@
+import re
+from typing import Optional, Tuple
+from backend.cache import make_cache
+from backend.config import GEOHASH_PRECISION, PLACE_INDEX_TTL
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+COORD_PATTERN = re.compile(r"^-?\d+(\.\d+)?\s*,\s*-?\d+(\.\d+)?$")
+
+# Maps a normalised city name or zip ("q:london", "zip:10001,us") to its geohash cell
+_place_index = make_cache("place_cell", ttl=PLACE_INDEX_TTL, max_entries=10000)
+
+
+def geohash_encode(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits, bit_count = 0, 0
+    return "".join(chars)
+
+
+def geohash_center(cell: str) -> Tuple[float, float]:
+    """Return the (lat, lon) centre of a geohash cell."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in cell:
+        idx = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (idx >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
+
+
+def snap(lat: float, lon: float) -> Tuple[str, float, float]:
+    """Snap a coordinate to its grid cell; returns (cell, centre_lat, centre_lon)."""
+    cell = geohash_encode(lat, lon)
+    c_lat, c_lon = geohash_center(cell)
+    return cell, round(c_lat, 4), round(c_lon, 4)
+
+
+def place_key(user_input: str, country_code: str = "us") -> Optional[str]:
+    """Normalised index key for a city name or zip; None for coordinates."""
+    text = " ".join(user_input.lower().split())
+    if not text or COORD_PATTERN.match(text):
+        return None
+    if text.isdigit():
+        return f"zip:{text},{country_code}"
+    return f"q:{text}"
+
+
+def cell_for_params(params: dict) -> Optional[str]:
+    """Cell for OpenWeather query params, if it can be known without a request."""
+    if "lat" in params and "lon" in params:
+        return geohash_encode(float(params["lat"]), float(params["lon"]))
+    if "q" in params:
+        return lookup_place(f"q:{' '.join(params['q'].lower().split())}")
+    if "zip" in params:
+        return lookup_place(f"zip:{params['zip'].lower()}")
+    return None
+
+
+def cell_for_response(data: dict) -> Optional[str]:
+    """Cell of the station OpenWeather answered with (current or forecast payload)."""
+    coord = (data or {}).get("coord") or ((data or {}).get("city") or {}).get("coord")
+    if not coord or coord.get("lat") is None or coord.get("lon") is None:
+        return None
+    return geohash_encode(float(coord["lat"]), float(coord["lon"]))
+
+
+def lookup_place(key: Optional[str]) -> Optional[str]:
+    return _place_index.get(key) if key else None
+
+
+def known_cell(user_input: str) -> Optional[str]:
+    """Cell for a city name, zip or "lat,lon" string, if it's known without a request."""
+    text = user_input.strip()
+    if COORD_PATTERN.match(text):
+        lat, lon = [float(x) for x in text.split(",")]
+        return geohash_encode(lat, lon)
+    return lookup_place(place_key(text)) if text else None
+
+
+def remember_place(key: Optional[str], cell: str) -> None:
+    """Index `key` under `cell` unless it already resolves somewhere."""
+    if key and _place_index.get(key) is None:
+        _place_index.set(key, cell)
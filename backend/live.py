@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import threading
+from backend import weather_api, quota, resilience, geo
+from backend.config import LIVE_POLL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_pollers = {}
+_pollers_lock = threading.Lock()
+
+
+def _flatten(value, prefix: str = "") -> dict:
+    """{"main": {"temp": 1}} -> {"main.temp": 1}; lists are indexed like "weather.0.main"."""
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        items = enumerate(value)
+    else:
+        return {prefix: value}
+    flat = {}
+    for key, child in items:
+        flat.update(_flatten(child, f"{prefix}.{key}" if prefix else str(key)))
+    return flat
+
+
+class Subscription:
+    """One client's queue of events, filled from poller threads."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxsize: int = 100):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.pollers = []
+
+    def _offer(self, event: dict) -> None:
+        if self.queue.full():
+            # Slow client: dropping single diffs would leave it with a wrong picture,
+            # so replace the backlog with one full snapshot per city. Those already
+            # include this event, as pollers update their snapshot before pushing.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            for poller in self.pollers:
+                snapshot = poller.full_event()
+                if snapshot is not None:
+                    self.queue.put_nowait(snapshot)
+            return
+        self.queue.put_nowait(event)
+
+    def push(self, event: dict) -> None:
+        """Thread-safe enqueue onto the subscriber's event loop."""
+        self.loop.call_soon_threadsafe(self._offer, event)
+
+
+class CityPoller:
+    """
+    Polls one (place, units) pair on a schedule, however many clients
+    watch it, and pushes only the fields that changed or disappeared since
+    the last poll.
+    """
+
+    def __init__(self, key: tuple, city: str, units: str):
+        self.key = key
+        self.city = city
+        self.units = units
+        self.subscribers = set()
+        self.snapshot = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"live-{city}", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def add(self, sub: Subscription) -> None:
+        # Pushing under the lock keeps a poll's diff from overtaking this snapshot;
+        # push only schedules onto the subscriber's loop, so it never blocks
+        with self._lock:
+            self.subscribers.add(sub)
+            if self.snapshot:
+                sub.push(self._event(dict(self.snapshot), full=True))
+
+    def remove(self, sub: Subscription) -> int:
+        with self._lock:
+            self.subscribers.discard(sub)
+            return len(self.subscribers)
+
+    def _event(self, changed: dict, removed: list = (), full: bool = False) -> dict:
+        """`full` events carry the whole state and replace whatever the client holds."""
+        return {"city": self.city, "units": self.units, "full": full, "changed": changed, "removed": list(removed)}
+
+    def full_event(self):
+        with self._lock:
+            return self._event(dict(self.snapshot), full=True) if self.snapshot else None
+
+    def poll_once(self) -> None:
+        try:
+            # max_age makes the shared cache hand back at most one poll interval old data,
+            # so pollers in other workers reuse this fetch instead of repeating it
+            data = weather_api.fetch_current_weather(
+                self.city, self.units, priority=quota.BACKGROUND, max_age=LIVE_POLL_SECONDS
+            )
+        except (quota.QuotaExceeded, resilience.UpstreamUnavailable) as exc:
+            logger.info("live poll for %s skipped: %s", self.city, exc)
+            return
+        if not data:
+            return
+        flat = _flatten(data)
+        with self._lock:
+            first = not self.snapshot
+            changed = {k: v for k, v in flat.items() if self.snapshot.get(k, object()) != v}
+            removed = [k for k in self.snapshot if k not in flat]  # e.g. rain.1h once it stops
+            self.snapshot = flat
+            if changed or removed:
+                event = self._event(changed, removed, full=first)
+                for sub in self.subscribers:
+                    sub.push(event)
+        if first:
+            _rekey(self)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception:
+                logger.exception("live poll for %s failed", self.city)
+            self._stop.wait(LIVE_POLL_SECONDS)
+
+
+def _place(city: str) -> str:
+    """Grid cell when the place index knows it, so spellings of one place share a poller."""
+    return geo.known_cell(city) or geo.place_key(city) or " ".join(city.split())
+
+
+def _rekey(poller: CityPoller) -> None:
+    """Move a poller started before its cell was known under that cell, if it's free."""
+    key = (_place(poller.city), poller.units)
+    with _pollers_lock:
+        if key != poller.key and key not in _pollers and _pollers.get(poller.key) is poller:
+            del _pollers[poller.key]
+            poller.key = key
+            _pollers[key] = poller
+
+
+def subscribe(cities: list, units: str, loop: asyncio.AbstractEventLoop) -> Subscription:
+    """Attach a new subscription to the poller of each city, starting pollers as needed."""
+    sub = Subscription(loop)
+    for city in cities:
+        key = (_place(city), units)
+        with _pollers_lock:
+            poller = _pollers.get(key)
+            if poller is None:
+                poller = _pollers[key] = CityPoller(key, city, units)
+                poller.start()
+            elif poller in sub.pollers:
+                continue  # same place spelled twice
+            poller.add(sub)
+        sub.pollers.append(poller)
+    return sub
+
+
+def unsubscribe(sub: Subscription) -> None:
+    """Detach a subscription; pollers with nobody left watching are stopped."""
+    for poller in sub.pollers:
+        with _pollers_lock:
+            if poller.remove(sub) == 0 and _pollers.get(poller.key) is poller:
+                del _pollers[poller.key]
+                poller.stop()
+
+
+def stop_all() -> None:
+    with _pollers_lock:
+        for poller in _pollers.values():
+            poller.stop()
+        _pollers.clear()
+
+
+def stats() -> dict:
+    with _pollers_lock:
+        return {f"{p.city} ({p.units})": len(p.subscribers) for p in _pollers.values()}
@@ -1,35 +1,160 @@
-from fastapi import FastAPI, HTTPException, Body
-from backend import weather_api, db_service, models, utils
+from fastapi import FastAPI, HTTPException, Body, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from backend import weather_api, db_service, models, utils, quota, resilience, prewarm, live, write_behind, observations
+from backend.config import (
+    PREWARM_ENABLED,
+    WRITE_BEHIND_ENABLED,
+    FORECAST_DEFAULT_FIELDS,
+    LIVE_KEEPALIVE_SECONDS,
+    LIVE_MAX_CITIES,
+)
+import asyncio
 import json
-from datetime import date
+from datetime import date, datetime, timedelta, timezone
 app = FastAPI(title="Weather API")
 
+FORECAST_FORMATS = ("full", "rows", "columnar")
+
 @app.on_event("startup")
 def startup_event():
     db_service.create_table()
+    observations.create_tables()
+    observations.start()
+    if WRITE_BEHIND_ENABLED:
+        write_behind.writer.start()
+    if PREWARM_ENABLED:
+        prewarm.start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    prewarm.stop()
+    live.stop_all()
+    observations.stop()
+    write_behind.writer.stop()  # commits any queued history rows
+
+@app.exception_handler(quota.QuotaExceeded)
+def quota_exceeded_handler(request: Request, exc: quota.QuotaExceeded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(int(exc.retry_after) + 1)},
+    )
+
+@app.exception_handler(resilience.UpstreamUnavailable)
+def upstream_unavailable_handler(request: Request, exc: resilience.UpstreamUnavailable):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+@app.get("/health/upstream", summary="Circuit breaker, quota and latency state per upstream")
+def upstream_health():
+    return {
+        "openweather": {
+            "breaker": resilience.openweather_breaker.stats(),
+            "quota": quota.openweather.stats(),
+            "latency": resilience.openweather_latency.stats(),
+        },
+        "gemini": {
+            "breaker": resilience.gemini_breaker.stats(),
+            "quota": quota.gemini.stats(),
+            "latency": resilience.gemini_latency.stats(),
+        },
+        "live_subscribers": live.stats(),
+    }
 
 @app.get("/weather/current", summary="Get current weather by city")
 def get_current_weather(city: str, units: str = "metric"):
+    if not city.strip():
+        raise HTTPException(status_code=400, detail="city is required")
+    prewarm.record_request(city, units)
     data = weather_api.fetch_current_weather(city, units)
     if not data:
         raise HTTPException(status_code=404, detail="Location not found")
     return data
 
 @app.get("/weather/forecast", summary="Get weather forecast by city")
-def get_forecast(city: str, units: str = "metric"):
+def get_forecast(city: str, units: str = "metric", fields: str = None, format: str = "full"):
+    """
+    `fields` is a comma-separated list of dotted paths (e.g. "dt,main.temp,weather.0.description").
+    `format=columnar` returns one array per field instead of a list of entries.
+    """
+    if not city.strip():
+        raise HTTPException(status_code=400, detail="city is required")
+    if format not in FORECAST_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(FORECAST_FORMATS)}")
+    prewarm.record_request(city, units)
     data = weather_api.fetch_forecast(city, units)
     if not data:
         raise HTTPException(status_code=404, detail="Location not found")
-    return data
+    if fields is None and format == "full":
+        return data
+    selected = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(FORECAST_DEFAULT_FIELDS)
+    return utils.project_forecast(data, selected, "columnar" if format == "columnar" else "rows")
+
+@app.get("/weather/stream", summary="Server-sent events with current weather changes for a set of cities")
+async def stream_weather(cities: str, units: str = "metric"):
+    """
+    `cities` is comma-separated. Each place gets one shared upstream poller no
+    matter how many clients watch it or how they spell it. The first event per
+    city is `full` and carries every field; later events carry the fields that
+    changed plus the `removed` ones. A client that falls behind gets a fresh
+    `full` event instead of the updates it missed.
+    """
+    names = [c.strip() for c in cities.split(",") if c.strip()]
+    if not names or len(names) > LIVE_MAX_CITIES:
+        raise HTTPException(status_code=400, detail=f"Provide between 1 and {LIVE_MAX_CITIES} cities")
+    sub = live.subscribe(names, units, asyncio.get_running_loop())
+
+    async def events():
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), timeout=LIVE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: weather\ndata: {json.dumps(event)}\n\n"
+        finally:
+            live.unsubscribe(sub)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/weather/observations", summary="Recorded weather for a city over a date range")
+def get_observations(city: str, date_from: date = None, date_to: date = None,
+                     resolution: str = "auto", units: str = "metric"):
+    """
+    Answers from locally recorded observations, so past dates work too.
+    Dates are inclusive, in UTC. `resolution` is raw, hour, day or auto.
+    """
+    if not city.strip():
+        raise HTTPException(status_code=400, detail="city is required")
+    if resolution not in observations.RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of {', '.join(observations.RESOLUTIONS)}")
+    date_to = date_to or date.today()
+    date_from = date_from or date_to
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from cannot be after date_to")
+    start = datetime.combine(date_from, datetime.min.time(), tzinfo=timezone.utc)
+    end = datetime.combine(date_to + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+    return observations.get_observations(city, int(start.timestamp()), int(end.timestamp()), resolution, units)
 
 @app.post("/history", summary="Create a weather history record")
 def create_weather_record(record: models.WeatherRecordCreate):
-    return db_service.create_record(record)
+    return write_behind.writer.create_record(record)
 
 @app.get("/history", summary="Get all weather history records")
 def read_weather_records():
     return db_service.get_all_records()
 
+@app.get("/history/stats", summary="Per-city temperature stats over saved records")
+def read_history_stats(city: str = None, bucket: str = "month", date_from: date = None, date_to: date = None):
+    if bucket not in db_service.STATS_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {', '.join(db_service.STATS_BUCKETS)}")
+    return db_service.get_history_stats(
+        city=city,
+        bucket=bucket,
+        date_from=date_from and date_from.isoformat(),
+        date_to=date_to and date_to.isoformat(),
+    )
+
 @app.delete("/history/{record_id}", summary="Delete a weather history record")
 def delete_weather_record(record_id: int):
     deleted = db_service.delete_record(record_id)
@@ -60,7 +185,7 @@ def refresh_weather_record(record_id: int, payload: dict = Body(default={})):
         raise HTTPException(status_code=404, detail="Record not found")
 
     unit = payload.get("unit", "metric")
-    fresh = weather_api.fetch_current_weather(user_input=record["city"], units=unit)
+    fresh = weather_api.fetch_current_weather(user_input=record["city"], units=unit, priority=quota.BACKGROUND)
     if not fresh:
         raise HTTPException(status_code=502, detail="Failed to fetch current weather")
 
@@ -0,0 +1,255 @@
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+from backend import geo
+from backend.db_service import get_connection
+from backend.config import (
+    OBS_RAW_RETENTION_DAYS,
+    OBS_HOURLY_RETENTION_DAYS,
+    OBS_MAINTENANCE_INTERVAL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+HOUR = 3600
+DAY = 86400
+RESOLUTIONS = ("auto", "raw", "hour", "day")
+
+_stop = threading.Event()
+_thread = None
+
+
+def create_tables():
+    """Append-only samples per grid cell (metric units), plus hourly/daily rollups."""
+    with get_connection() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS observations (
+                place TEXT NOT NULL,
+                ts INTEGER NOT NULL,
+                temp REAL,
+                humidity REAL,
+                wind_speed REAL,
+                pressure REAL,
+                PRIMARY KEY (place, ts)
+            ) WITHOUT ROWID
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS observation_rollups (
+                place TEXT NOT NULL,
+                resolution TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                samples INTEGER NOT NULL,
+                temp_avg REAL,
+                temp_min REAL,
+                temp_max REAL,
+                humidity_avg REAL,
+                wind_avg REAL,
+                pressure_avg REAL,
+                PRIMARY KEY (place, resolution, bucket)
+            ) WITHOUT ROWID
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS observation_places (
+                place TEXT PRIMARY KEY,
+                name TEXT,
+                lat REAL,
+                lon REAL
+            )
+        """)
+        # Durable copy of the place index entries that led to a cell, which expire
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS observation_aliases (
+                alias TEXT PRIMARY KEY,
+                place TEXT NOT NULL
+            ) WITHOUT ROWID
+        """)
+
+
+def _to_metric(temp, wind, units: str):
+    if units == "imperial":
+        temp = None if temp is None else (temp - 32) * 5 / 9
+        wind = None if wind is None else wind * 0.44704
+    elif units == "standard":
+        temp = None if temp is None else temp - 273.15
+    return temp, wind
+
+
+def _from_metric(temp, wind, units: str):
+    if units == "imperial":
+        temp = None if temp is None else temp * 9 / 5 + 32
+        wind = None if wind is None else wind / 0.44704
+    elif units == "standard":
+        temp = None if temp is None else temp + 273.15
+    return temp, wind
+
+
+def record(cell: str, weather: dict, units: str, aliases=()) -> None:
+    """
+    Store one current-weather payload; refetches of the same reading are
+    ignored. `aliases` are the place keys ("q:london", "zip:10001,us") that
+    resolved to `cell`, so its history can still be found by name later.
+    """
+    main = weather.get("main") or {}
+    ts = weather.get("dt")
+    if ts is None or not main:
+        return
+    temp, wind = _to_metric(main.get("temp"), (weather.get("wind") or {}).get("speed"), units)
+    coord = weather.get("coord") or {}
+    with get_connection() as conn:
+        conn.execute(
+            """
+            INSERT OR IGNORE INTO observations (place, ts, temp, humidity, wind_speed, pressure)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (cell, int(ts), temp, main.get("humidity"), wind, main.get("pressure")),
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO observation_places (place, name, lat, lon) VALUES (?, ?, ?, ?)",
+            (cell, weather.get("name"), coord.get("lat"), coord.get("lon")),
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO observation_aliases (alias, place) VALUES (?, ?)",
+            [(alias, cell) for alias in aliases if alias],
+        )
+
+
+def rollup_and_downsample(now: Optional[float] = None) -> None:
+    """
+    Rebuild hourly rollups from raw samples and daily rollups from hourly
+    ones, then drop raw and hourly data past retention. Cutoffs are aligned
+    to bucket boundaries, so a bucket is never rebuilt from partial data.
+    """
+    now = int(now or time.time())
+    raw_cutoff = (now - OBS_RAW_RETENTION_DAYS * DAY) // HOUR * HOUR
+    hourly_cutoff = (now - OBS_HOURLY_RETENTION_DAYS * DAY) // DAY * DAY
+    with get_connection() as conn:
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO observation_rollups
+            SELECT place, 'hour', ts - ts % 3600, COUNT(*),
+                   AVG(temp), MIN(temp), MAX(temp), AVG(humidity), AVG(wind_speed), AVG(pressure)
+              FROM observations
+             WHERE ts >= ?
+             GROUP BY place, ts - ts % 3600
+            """,
+            (raw_cutoff,),
+        )
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO observation_rollups
+            SELECT place, 'day', bucket - bucket % 86400, SUM(samples),
+                   SUM(temp_avg * samples) / SUM(samples), MIN(temp_min), MAX(temp_max),
+                   SUM(humidity_avg * samples) / SUM(samples),
+                   SUM(wind_avg * samples) / SUM(samples),
+                   SUM(pressure_avg * samples) / SUM(samples)
+              FROM observation_rollups
+             WHERE resolution = 'hour' AND bucket >= ?
+             GROUP BY place, bucket - bucket % 86400
+            """,
+            (hourly_cutoff,),
+        )
+        conn.execute("DELETE FROM observations WHERE ts < ?", (raw_cutoff,))
+        conn.execute(
+            "DELETE FROM observation_rollups WHERE resolution = 'hour' AND bucket < ?",
+            (hourly_cutoff,),
+        )
+
+
+def resolve_place(city: str) -> Optional[str]:
+    """Grid cell for a city name, zip or "lat,lon" string, if we have seen it."""
+    if geo.COORD_PATTERN.match(city.strip()):
+        return geo.known_cell(city)
+    key = geo.place_key(city)
+    with get_connection() as conn:
+        row = conn.execute("SELECT place FROM observation_aliases WHERE alias = ?", (key,)).fetchone()
+        if row is None:
+            cell = geo.lookup_place(key)
+            if cell:
+                return cell
+            row = conn.execute(
+                "SELECT place FROM observation_places WHERE name = ? COLLATE NOCASE", (city.strip(),)
+            ).fetchone()
+    return row[0] if row else None
+
+
+def _pick_resolution(start: int, end: int, now: int) -> str:
+    """Finest resolution that still holds data for `start` and keeps the answer small."""
+    span = end - start
+    if span <= 2 * DAY and start >= now - OBS_RAW_RETENTION_DAYS * DAY:
+        return "raw"
+    if span <= 31 * DAY and start >= now - OBS_HOURLY_RETENTION_DAYS * DAY:
+        return "hour"
+    return "day"
+
+
+def get_observations(city: str, start: int, end: int, resolution: str = "auto", units: str = "metric"):
+    """Time series for [start, end) (unix seconds), converted to `units`."""
+    place = resolve_place(city)
+    now = int(time.time())
+    if resolution == "auto":
+        resolution = _pick_resolution(start, end, now)
+    points = []
+    if place:
+        with get_connection() as conn:
+            if resolution == "raw":
+                rows = conn.execute(
+                    """
+                    SELECT ts, 1, temp, temp, temp, humidity, wind_speed, pressure
+                      FROM observations
+                     WHERE place = ? AND ts >= ? AND ts < ?
+                     ORDER BY ts
+                    """,
+                    (place, start, end),
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    """
+                    SELECT bucket, samples, temp_avg, temp_min, temp_max, humidity_avg, wind_avg, pressure_avg
+                      FROM observation_rollups
+                     WHERE place = ? AND resolution = ? AND bucket >= ? AND bucket < ?
+                     ORDER BY bucket
+                    """,
+                    (place, resolution, start - start % (HOUR if resolution == "hour" else DAY), end),
+                ).fetchall()
+        for ts, samples, t_avg, t_min, t_max, humidity, wind, pressure in rows:
+            t_avg, wind = _from_metric(t_avg, wind, units)
+            t_min, _ = _from_metric(t_min, None, units)
+            t_max, _ = _from_metric(t_max, None, units)
+            points.append({
+                "time": datetime.fromtimestamp(ts, tz=timezone.utc).isoformat(),
+                "samples": samples,
+                "temp": t_avg,
+                "temp_min": t_min,
+                "temp_max": t_max,
+                "humidity": humidity,
+                "wind_speed": wind,
+                "pressure": pressure,
+            })
+    return {"city": city, "place": place, "resolution": resolution, "units": units, "points": points}
+
+
+def _run() -> None:
+    while not _stop.is_set():
+        try:
+            rollup_and_downsample()
+        except Exception:
+            logger.exception("observation rollup failed")
+        _stop.wait(OBS_MAINTENANCE_INTERVAL_SECONDS)
+
+
+def start() -> None:
+    """Run rollups and retention now and then every OBS_MAINTENANCE_INTERVAL_SECONDS."""
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="observation-rollups", daemon=True)
+    _thread.start()
+
+
+def stop() -> None:
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout=5)
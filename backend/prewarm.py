@@ -0,0 +1,137 @@
+import logging
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from backend import weather_api, db_service, quota, resilience, geo
+from backend.cache import acquire_lease, release_lease
+from backend.config import (
+    SHARED_CACHE_ENABLED,
+    WEATHER_CACHE_TTL,
+    PREWARM_TOP_N,
+    PREWARM_INTERVAL_SECONDS,
+    PREWARM_BUDGET_PER_CYCLE,
+    PREWARM_REFRESH_AT,
+    PREWARM_REQUEST_WINDOW_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# (timestamp, location, units) of recent interactive lookups
+_requests = deque(maxlen=10000)
+_requests_lock = threading.Lock()
+# (location, units, path) -> time before which a fetch that came back empty isn't retried
+_misses = {}
+_stop = threading.Event()
+_thread = None
+
+LEASE = "prewarm"
+# Outlives a slow cycle (a budget of fetches at up to the read timeout each)
+LEASE_TTL = PREWARM_INTERVAL_SECONDS * 3
+_holder = uuid.uuid4().hex
+
+
+def record_request(city: str, units: str) -> None:
+    with _requests_lock:
+        _requests.append((time.time(), " ".join(city.split()), units))
+
+
+def _place(city: str) -> str:
+    return geo.known_cell(city) or geo.place_key(city) or city
+
+
+def top_locations(limit: int = PREWARM_TOP_N):
+    """
+    Rank (location, units) pairs by recent request count plus saved-history
+    record count. Spellings already known to resolve to the same grid
+    cell are merged.
+    """
+    cutoff = time.time() - PREWARM_REQUEST_WINDOW_SECONDS
+    scores = Counter()
+    names = {}
+    with _requests_lock:
+        recent = [(city, units) for ts, city, units in _requests if ts >= cutoff]
+    for city, units in recent:
+        ident = (_place(city), units)
+        scores[ident] += 1
+        names.setdefault(ident, city)
+    # History doesn't say which units were requested, so it warms metric
+    for city, count in db_service.get_city_counts(limit):
+        ident = (_place(city), "metric")
+        scores[ident] += count
+        names.setdefault(ident, city)
+    return [(names[ident], ident[1]) for ident, _ in scores.most_common(limit)]
+
+
+def warm_once(budget: int = PREWARM_BUDGET_PER_CYCLE) -> int:
+    """Refresh hot entries nearing expiry; returns the number of upstream fetches spent."""
+    refresh_after = WEATHER_CACHE_TTL * PREWARM_REFRESH_AT
+    now = time.time()
+    for miss, until in list(_misses.items()):
+        if until <= now:
+            del _misses[miss]
+    spent = 0
+    for city, units in top_locations():
+        for path, fetch in (("weather", weather_api.fetch_current_weather), ("forecast", weather_api.fetch_forecast)):
+            age = weather_api.cache_age(path, city, units)
+            if (age is not None and age < refresh_after) or (city, units, path) in _misses:
+                continue
+            if spent >= budget:
+                return spent
+            started = time.time()
+            try:
+                data = fetch(city, units, priority=quota.BACKGROUND, max_age=refresh_after)
+            except (quota.QuotaExceeded, resilience.UpstreamUnavailable) as exc:
+                # Upstream is busy or unhealthy; interactive traffic comes first
+                logger.info("prewarm stopped early: %s", exc)
+                return spent
+            age = weather_api.cache_age(path, city, units)
+            if age is None:
+                # Unknown place (404) or a cell we can't learn: its age stays None,
+                # so without this it would be refetched every cycle
+                _misses[(city, units, path)] = time.time() + WEATHER_CACHE_TTL
+            elif age >= refresh_after:
+                logger.info("prewarm stopped early: got stale data for %s", city)
+                return spent
+            if data is None or age is None or age <= time.time() - started:
+                spent += 1  # stored during this call, so it came from upstream, not another worker
+    return spent
+
+
+def _is_warmer() -> bool:
+    """
+    With the shared cache, one worker per host holds the lease and warms for
+    all of them, so the budget isn't multiplied by the worker count. It ranks
+    by its own share of the traffic, which the load balancer spreads evenly.
+    """
+    return not SHARED_CACHE_ENABLED or acquire_lease(LEASE, _holder, LEASE_TTL)
+
+
+def _run() -> None:
+    while not _stop.is_set():
+        try:
+            if _is_warmer():
+                spent = warm_once()
+                if spent:
+                    logger.info("prewarm refreshed %d entries", spent)
+        except Exception:
+            logger.exception("prewarm cycle failed")
+        _stop.wait(PREWARM_INTERVAL_SECONDS)
+
+
+def start() -> None:
+    """Warm the hot set now and keep it warm in a daemon thread."""
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="prewarm", daemon=True)
+    _thread.start()
+
+
+def stop() -> None:
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout=5)
+    if SHARED_CACHE_ENABLED:
+        release_lease(LEASE, _holder)  # let another worker take over without waiting out the lease
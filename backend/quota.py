@@ -0,0 +1,131 @@
+import threading
+import time
+from backend.cache import shared_connection
+from backend.config import (
+    OPENWEATHER_RATE_PER_MIN,
+    GEMINI_RATE_PER_MIN,
+    QUOTA_MAX_WAIT_SECONDS,
+    QUOTA_INTERACTIVE_RESERVE,
+    SHARED_CACHE_ENABLED,
+)
+
+# Priority lanes, lower value is served first
+INTERACTIVE = 0
+BACKGROUND = 1
+LANES = (INTERACTIVE, BACKGROUND)
+
+
+class QuotaExceeded(Exception):
+    """Raised when no upstream token frees up before the caller's deadline."""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"{upstream} quota exhausted, retry in {retry_after:.1f}s")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by every caller of one upstream in this
+    process. Interactive callers always go first and may drain the whole
+    bucket; background callers only spend tokens above the interactive reserve.
+    """
+
+    def __init__(self, name: str, rate_per_min: int, reserve: float = 0.0):
+        self.name = name
+        self.rate = rate_per_min / 60.0
+        self.capacity = float(rate_per_min)
+        self.reserve = self.capacity * reserve
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.waiting = {lane: 0 for lane in LANES}
+        self.cond = threading.Condition()
+
+    def _draw(self, floor: float, take: bool = True) -> float:
+        """
+        Refill, then take one token if `take` and at least `floor + 1` are
+        left. Returns the level before taking. Caller holds self.cond.
+        """
+        now = time.monotonic()
+        level = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.tokens = level - 1 if take and level >= floor + 1 else level
+        self.updated = now
+        return level
+
+    def _floor(self, priority: int) -> float:
+        return 0.0 if priority == INTERACTIVE else self.reserve
+
+    def _blocked_by_higher_lane(self, priority: int) -> bool:
+        return any(self.waiting[lane] for lane in LANES if lane < priority)
+
+    def acquire(self, priority: int = INTERACTIVE, timeout: float = QUOTA_MAX_WAIT_SECONDS) -> None:
+        """Take one token, waiting at most `timeout` seconds or raising QuotaExceeded."""
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            self.waiting[priority] += 1
+            try:
+                while True:
+                    floor = self._floor(priority)
+                    blocked = self._blocked_by_higher_lane(priority)
+                    needed = floor + 1 - self._draw(floor, take=not blocked)
+                    if needed <= 0 and not blocked:
+                        return
+                    refill_in = max(needed, 0) / self.rate
+                    remaining = deadline - time.monotonic()
+                    # Fail fast when even an idle bucket can't refill in time
+                    if remaining <= 0 or refill_in > remaining:
+                        raise QuotaExceeded(self.name, max(refill_in, 0.1))
+                    self.cond.wait(max(refill_in, 0.01) if needed > 0 else remaining)
+            finally:
+                self.waiting[priority] -= 1
+                self.cond.notify_all()
+
+    def stats(self) -> dict:
+        with self.cond:
+            return {
+                "tokens": round(self._draw(0.0, take=False), 2),
+                "capacity": self.capacity,
+                "reserve": self.reserve,
+                "waiting": {"interactive": self.waiting[INTERACTIVE], "background": self.waiting[BACKGROUND]},
+            }
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    TokenBucket whose level lives in the shared store, so every worker
+    process on the host draws from one bucket and the configured rate is
+    the host's rate, not each worker's. Lane waiting stays per process.
+    """
+
+    def _draw(self, floor: float, take: bool = True) -> float:
+        conn = shared_connection()
+        # IMMEDIATE takes the write lock up front, so read-refill-take is atomic across processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM token_buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            now = time.time()  # wall clock: monotonic clocks aren't comparable between processes
+            if row is None:
+                level = self.capacity
+            else:
+                level = min(self.capacity, row[0] + max(now - row[1], 0.0) * self.rate)
+            tokens = level - 1 if take and level >= floor + 1 else level
+            conn.execute(
+                """
+                INSERT INTO token_buckets (name, tokens, updated) VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated
+                """,
+                (self.name, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return level
+
+
+_Bucket = SharedTokenBucket if SHARED_CACHE_ENABLED else TokenBucket
+
+openweather = _Bucket("openweather", OPENWEATHER_RATE_PER_MIN, reserve=QUOTA_INTERACTIVE_RESERVE)
+gemini = _Bucket("gemini", GEMINI_RATE_PER_MIN, reserve=QUOTA_INTERACTIVE_RESERVE)
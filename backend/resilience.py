@@ -0,0 +1,184 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+from typing import Callable, Optional
+from backend.config import (
+    HEDGE_MIN_SAMPLES,
+    HEDGE_MAX_IN_FLIGHT,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RESET_SECONDS,
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class UpstreamUnavailable(Exception):
+    """Raised when an upstream failed or timed out and there is nothing cached to serve."""
+
+    def __init__(self, upstream: str, reason: str):
+        super().__init__(f"{upstream} unavailable: {reason}")
+        self.upstream = upstream
+
+
+class CircuitOpen(UpstreamUnavailable):
+    """Raised without calling the upstream while its breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and rejects calls for
+    `reset_after` seconds, then lets a single trial call through. A trial
+    that never reports back (e.g. it ran out of quota) is retried after
+    another `reset_after` seconds.
+    """
+
+    def __init__(self, name: str, threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_after: float = BREAKER_RESET_SECONDS):
+        self.name = name
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_started = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_after:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN:
+                now = time.monotonic()
+                if self._trial_started is None or now - self._trial_started >= self.reset_after:
+                    self._trial_started = now
+                    return True
+            return False
+
+    def check(self) -> None:
+        if not self.allow():
+            raise CircuitOpen(self.name, "circuit open")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._trial_started = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_started = None
+            if self.state == HALF_OPEN or self.failures >= self.threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        with self._lock:
+            retry_in = 0.0
+            if self.state == OPEN:
+                retry_in = max(0.0, self.reset_after - (time.monotonic() - self.opened_at))
+            return {"state": self.state, "consecutive_failures": self.failures, "retry_in": round(retry_in, 1)}
+
+
+class LatencyTracker:
+    """Rolling window of successful call durations, in seconds."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Return the p-th quantile, or None until there are enough samples to trust it."""
+        with self._lock:
+            if len(self._samples) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    def stats(self) -> dict:
+        with self._lock:
+            count = len(self._samples)
+        quantiles = {}
+        if count >= HEDGE_MIN_SAMPLES:
+            quantiles = {f"p{int(p * 100)}": round(self.percentile(p), 3) for p in (0.5, 0.95, 0.99)}
+        return {"samples": count, **quantiles}
+
+
+_hedges_in_flight = 0
+_hedges_lock = threading.Lock()
+
+def _claim_hedge() -> bool:
+    global _hedges_in_flight
+    with _hedges_lock:
+        if _hedges_in_flight >= HEDGE_MAX_IN_FLIGHT:
+            return False
+        _hedges_in_flight += 1
+        return True
+
+def _release_hedge() -> None:
+    global _hedges_in_flight
+    with _hedges_lock:
+        _hedges_in_flight -= 1
+
+def _hedges_full() -> bool:
+    with _hedges_lock:
+        return _hedges_in_flight >= HEDGE_MAX_IN_FLIGHT
+
+
+def _start(fn: Callable, on_done: Optional[Callable[[], None]] = None) -> Future:
+    """Run `fn` on a thread of its own right away; no pool, so nothing queues."""
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(fn())
+        except BaseException as exc:
+            future.set_exception(exc)
+        finally:
+            if on_done is not None:
+                on_done()
+
+    future.set_running_or_notify_cancel()
+    threading.Thread(target=run, name="hedged-call", daemon=True).start()
+    return future
+
+
+def hedged_call(fn: Callable, hedge_after: Optional[float], can_hedge: Callable[[], bool]):
+    """
+    Run `fn`; if it hasn't finished `hedge_after` seconds after it started
+    and `can_hedge()` agrees, start a second identical call and return
+    whichever succeeds first. At most HEDGE_MAX_IN_FLIGHT backups run at
+    once; when they're all busy `fn` simply runs on the caller's thread.
+    """
+    if hedge_after is None or _hedges_full():
+        return fn()
+    primary = _start(fn)
+    done, _ = wait([primary], timeout=hedge_after)
+    if done or not _claim_hedge():
+        return primary.result()
+    if not can_hedge():
+        _release_hedge()
+        return primary.result()
+
+    backup = _start(fn, on_done=_release_hedge)
+    done, _ = wait([primary, backup], return_when=FIRST_COMPLETED)
+    winner = done.pop()
+    if winner.exception() is not None:
+        other = backup if winner is primary else primary
+        return other.result()
+    return winner.result()
+
+
+openweather_breaker = CircuitBreaker("openweather")
+gemini_breaker = CircuitBreaker("gemini")
+openweather_latency = LatencyTracker()
+gemini_latency = LatencyTracker()
@@ -1,10 +1,40 @@
-import re
-import google.generativeai as genai
-from backend.config import LLM_API_KEY
+import threading
+import time
+from backend import quota, resilience, geo
+from backend.cache import make_cache
+from backend.config import LLM_API_KEY, LLM_TIMEOUT_SECONDS
 
-genai.configure(api_key=LLM_API_KEY)
+# google.generativeai dominates cold start, so the client is built on first use
+_model = None
+_model_lock = threading.Lock()
 
-model = genai.GenerativeModel("gemini-2.0-flash")
+def get_model():
+    """Return the shared Gemini model, importing and configuring the SDK on first call."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                import google.generativeai as genai
+                genai.configure(api_key=LLM_API_KEY)
+                _model = genai.GenerativeModel("gemini-2.0-flash")
+    return _model
+
+# City spellings don't change, so each correction costs one Gemini call per day
+_corrections = make_cache("city_correction", ttl=86400, max_entries=4096)
+
+def _generate(prompt: str) -> str:
+    """Call Gemini with a deadline, feeding the shared breaker and latency stats."""
+    breaker = resilience.gemini_breaker
+    started = time.monotonic()
+    try:
+        resp = get_model().generate_content(prompt, request_options={"timeout": LLM_TIMEOUT_SECONDS})
+        text = resp.text
+    except Exception as exc:
+        breaker.record_failure()
+        raise resilience.UpstreamUnavailable("gemini", type(exc).__name__) from exc
+    breaker.record_success()
+    resilience.gemini_latency.record(time.monotonic() - started)
+    return text
 
 def summarize_weather(city, weather_data, forecast_data):
     prompt = f"""
@@ -14,14 +44,21 @@ def summarize_weather(city, weather_data, forecast_data):
     Forecast: {forecast_data}
     Provide a user-friendly explanation and any recommendations.
     """
-    response = model.generate_content(prompt)
-    return response.text
+    resilience.gemini_breaker.check()
+    # Summaries are a nice-to-have, so they queue behind interactive lookups
+    quota.gemini.acquire(quota.BACKGROUND)
+    return _generate(prompt)
 
-def correct_city_name(user_input: str) -> str:
+def correct_city_name(user_input: str, priority: int = quota.INTERACTIVE) -> str:
     """
     Use AI to correct typos or fuzzy match the city name.
     Returns a best-guess city string.
     """
+    cached = _corrections.get(user_input.lower())
+    if cached is not None:
+        return cached
+    if not resilience.gemini_breaker.allow():
+        return user_input  # don't wait on an unhealthy upstream for a nicety
     try:
         prompt = f"""
         You are a city name autocorrect system. 
@@ -29,27 +66,57 @@ def correct_city_name(user_input: str) -> str:
         If input is already correct, return it as-is.
         Do not add extra text, just the city name.
         """
-        resp = model.generate_content(prompt)
-        return resp.text.strip()
+        quota.gemini.acquire(priority)
+        corrected = _generate(prompt).strip()
+        _corrections.set(user_input.lower(), corrected)
+        return corrected
     except Exception:
         return user_input  # fallback
 
 
-def detect_location_params(user_input: str, country_code: str = "us") -> dict:
+def detect_location_params(user_input: str, country_code: str = "us", priority: int = quota.INTERACTIVE) -> dict:
     # Remove extra spaces
     user_input = user_input.strip()
 
-    # Check if input is coordinates (latitude,longitude)
-    coord_pattern = re.compile(r"^-?\d+(\.\d+)?\s*,\s*-?\d+(\.\d+)?$")
-    if coord_pattern.match(user_input):
-        lat, lon = [x.strip() for x in user_input.split(",")]
-        return {"lat": lat, "lon": lon}
+    # Check if input is coordinates (latitude,longitude), snapped to the grid
+    # so nearby points share one upstream call and cache entry
+    if geo.COORD_PATTERN.match(user_input):
+        lat, lon = [float(x) for x in user_input.split(",")]
+        _, lat, lon = geo.snap(lat, lon)
+        return {"lat": str(lat), "lon": str(lon)}
 
     # Check if input is numeric (likely ZIP/Postal code)
     if user_input.isdigit():
         return {"zip": f"{user_input},{country_code}"}
 
     # --- NEW: AI correction for city typos ---
-    resolved_city = correct_city_name(user_input)
+    resolved_city = correct_city_name(user_input, priority)
+
+    return {"q": resolved_city}
+
+def _pluck(entry, path: list):
+    """Follow a dotted path such as ["weather", "0", "description"]; None if absent."""
+    for part in path:
+        if isinstance(entry, list):
+            entry = entry[int(part)] if part.isdigit() and int(part) < len(entry) else None
+        elif isinstance(entry, dict):
+            entry = entry.get(part)
+        else:
+            return None
+    return entry
+
+def project_forecast(forecast: dict, fields: list, fmt: str = "rows") -> dict:
+    """
+    Keep only `fields` (dotted paths) of each forecast entry.
+    fmt="rows" returns one flat {field: value} dict per entry under "list";
+    fmt="columnar" returns one parallel array per field under "columns".
+    """
+    entries = forecast.get("list", [])
+    paths = [field.split(".") for field in fields]
+    slim = {"city": forecast.get("city"), "cnt": len(entries)}
+    if fmt == "columnar":
+        slim["columns"] = {field: [_pluck(e, path) for e in entries] for field, path in zip(fields, paths)}
+        return slim
 
-    return {"q": resolved_city}
\ No newline at end of file
+    slim["list"] = [{field: _pluck(e, path) for field, path in zip(fields, paths)} for e in entries]
+    return slim
@@ -1,19 +1,125 @@
+import logging
+import time
 import requests
+from backend import quota, resilience, geo, observations
+from backend.cache import make_cache, SingleFlight
 from backend.utils import detect_location_params
-from backend.config import WEATHER_API_KEY, BASE_URL
-
-def fetch_current_weather(user_input, units: str = "metric"):
-    url = f"{BASE_URL}/weather"
-    params = detect_location_params(user_input, country_code="us")
-    params["appid"] = WEATHER_API_KEY
-    params["units"] = units
-    resp = requests.get(url, params=params)
-    return resp.json() if resp.status_code == 200 else None
-
-def fetch_forecast(user_input, units: str = "metric"):
-    url = f"{BASE_URL}/forecast"
-    params = detect_location_params(user_input, country_code="us") 
-    params["appid"] = WEATHER_API_KEY
-    params["units"] = units
-    resp = requests.get(url, params=params)
-    return resp.json() if resp.status_code == 200 else None
\ No newline at end of file
+from backend.config import (
+    WEATHER_API_KEY,
+    BASE_URL,
+    WEATHER_CACHE_TTL,
+    WEATHER_CACHE_MAX_STALE,
+    UPSTREAM_TIMEOUT,
+    HEDGE_REQUESTS,
+    HEDGE_PERCENTILE,
+)
+
+logger = logging.getLogger(__name__)
+
+_cache = make_cache("weather", WEATHER_CACHE_TTL, max_stale=WEATHER_CACHE_MAX_STALE)
+_inflight = SingleFlight()
+
+def _try_hedge() -> bool:
+    """Hedges only spend spare quota, never tokens reserved for interactive calls."""
+    try:
+        quota.openweather.acquire(quota.BACKGROUND, timeout=0)
+        return True
+    except quota.QuotaExceeded:
+        return False
+
+def _get(url: str, params: dict) -> requests.Response:
+    breaker = resilience.openweather_breaker
+    hedge_after = resilience.openweather_latency.percentile(HEDGE_PERCENTILE) if HEDGE_REQUESTS else None
+    started = time.monotonic()
+    try:
+        resp = resilience.hedged_call(
+            lambda: requests.get(url, params=params, timeout=UPSTREAM_TIMEOUT),
+            hedge_after,
+            _try_hedge,
+        )
+    except requests.RequestException as exc:
+        breaker.record_failure()
+        raise resilience.UpstreamUnavailable("openweather", type(exc).__name__) from exc
+
+    if resp.status_code == 429 or resp.status_code >= 500:
+        breaker.record_failure()
+        raise resilience.UpstreamUnavailable("openweather", f"HTTP {resp.status_code}")
+    breaker.record_success()
+    resilience.openweather_latency.record(time.monotonic() - started)
+    return resp
+
+def _fetch(path: str, user_input, units: str, priority: int, max_age=None):
+    """GET an OpenWeather endpoint through the shared cache, quota and circuit breaker."""
+    place = geo.place_key(user_input)
+    cell = geo.lookup_place(place)
+    params = None
+    if cell is None:
+        params = detect_location_params(user_input, country_code="us", priority=priority)
+        cell = geo.cell_for_params(params)
+    # Everything that lands in the same grid cell shares one entry and one flight
+    key = (path, units, cell or tuple(sorted(params.items())))
+    cached = _cache.get(key, max_age=max_age)
+    if cached is not None:
+        return cached
+
+    if params is None:
+        params = detect_location_params(user_input, country_code="us", priority=priority)
+    return _inflight.do(key, lambda: _fetch_upstream(path, params, units, key, place, priority, max_age))
+
+def _fetch_upstream(path: str, params: dict, units: str, key: tuple, place, priority: int, max_age=None):
+    cached = _cache.get(key, max_age=max_age)  # a flight that just finished may have filled it
+    if cached is not None:
+        return cached
+
+    try:
+        resilience.openweather_breaker.check()
+        quota.openweather.acquire(priority)
+        query = dict(params, units=units, appid=WEATHER_API_KEY)
+        resp = _get(f"{BASE_URL}/{path}", query)
+    except (quota.QuotaExceeded, resilience.UpstreamUnavailable):
+        # Stale data beats an error while the upstream is out of quota or unhealthy
+        stale = _cache.get(key, allow_stale=True)
+        if stale is not None:
+            return stale
+        raise
+
+    if resp.status_code != 200:
+        return None
+    data = resp.json()
+    _cache.set(key, data)
+    # A place keeps the first cell it resolved to, so weather and forecast
+    # (whose station coordinates can differ slightly) stay under one cell
+    cell = key[2] if isinstance(key[2], str) else geo.lookup_place(place) or geo.cell_for_response(data)
+    if cell:
+        geo.remember_place(place, cell)
+        if "q" in params:
+            geo.remember_place(geo.place_key(params["q"]), cell)
+        _cache.set((path, units, cell), data)
+        if path == "weather":
+            try:
+                aliases = (place, geo.place_key(params["q"]) if "q" in params else None)
+                observations.record(cell, data, units, aliases)
+            except Exception:
+                logger.exception("failed to record observation for %s", cell)
+    return data
+
+def cache_age(path: str, user_input, units: str = "metric"):
+    """
+    Age in seconds of the cached `path` ("weather"/"forecast") entry for a
+    location, or None when it isn't cached or its cell isn't known yet.
+    Never calls an upstream.
+    """
+    place = geo.place_key(user_input)
+    if place is not None:
+        cell = geo.lookup_place(place)
+    elif geo.COORD_PATTERN.match(user_input.strip()):
+        cell = geo.cell_for_params(detect_location_params(user_input))
+    else:
+        return None  # blank input; resolving it would ask the LLM
+    return _cache.age((path, units, cell)) if cell else None
+
+def fetch_current_weather(user_input, units: str = "metric", priority: int = quota.INTERACTIVE, max_age=None):
+    return _fetch("weather", user_input, units, priority, max_age)
+
+def fetch_forecast(user_input, units: str = "metric", priority: int = quota.INTERACTIVE, max_age=None):
+    return _fetch("forecast", user_input, units, priority, max_age)
@@ -0,0 +1,96 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from backend import db_service
+from backend.config import WRITE_BEHIND_MAX_BATCH, WRITE_BEHIND_MAX_DELAY_MS
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryWriteQueue:
+    """
+    Group commit for history inserts. Callers still block until their row
+    is committed and get its id back, but rows arriving within a few
+    milliseconds of each other share one transaction (and one fsync).
+    """
+
+    def __init__(self, max_batch: int = WRITE_BEHIND_MAX_BATCH, max_delay_ms: float = WRITE_BEHIND_MAX_DELAY_MS):
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self._queue = queue.Queue()
+        self._accepting = False
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._accepting
+
+    def start(self) -> None:
+        with self._lock:
+            if self._accepting:
+                return
+            self._accepting = True
+            self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop accepting rows and block until everything queued is committed."""
+        with self._lock:
+            if not self._accepting:
+                return
+            self._accepting = False
+            self._queue.put(None)  # wakes the writer; it drains the rest before exiting
+        self._thread.join()
+
+    def create_record(self, record) -> dict:
+        future = Future()
+        with self._lock:
+            accepting = self._accepting
+            if accepting:
+                self._queue.put((record, future))
+        if not accepting:
+            return db_service.create_record(record)
+        return {"id": future.result()}
+
+    def _run(self) -> None:
+        # The stop sentinel is queued after the last accepted row (both under
+        # self._lock), so seeing it means every row has been taken off the queue.
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            batch = []
+            deadline = time.monotonic() + self.max_delay
+            while True:
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                remaining = deadline - time.monotonic()
+                if len(batch) >= self.max_batch or remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch: list) -> None:
+        try:
+            ids = db_service.create_records([record for record, _ in batch])
+        except Exception:
+            logger.exception("batched insert of %d rows failed, retrying one by one", len(batch))
+            for record, future in batch:
+                try:
+                    future.set_result(db_service.create_records([record])[0])
+                except Exception as exc:
+                    future.set_exception(exc)
+            return
+        for (_, future), record_id in zip(batch, ids):
+            future.set_result(record_id)
+
+
+writer = HistoryWriteQueue()
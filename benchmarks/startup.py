@@ -0,0 +1,79 @@
+"""
+Cold-start benchmark for the backend.
+
+Imports the FastAPI app in fresh interpreters and reports wall time plus the
+slowest modules from `python -X importtime`. Run from the project root:
+
+    python benchmarks/startup.py [--module backend.main_api] [--runs 5] [--top 15] [--budget-ms 800]
+
+With --budget-ms the script exits non-zero when the median import time
+exceeds the budget, so it can gate CI.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def time_import(module: str) -> float:
+    """Wall time in ms to start an interpreter and import `module`."""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=ROOT, check=True)
+    return (time.perf_counter() - started) * 1000
+
+
+def import_profile(module: str):
+    """Return [(cumulative_us, self_us, name)] parsed from -X importtime."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, check=True, capture_output=True, text=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="backend.main_api")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    baseline = statistics.median(time_import("sys") for _ in range(args.runs))
+    samples = [time_import(args.module) for _ in range(args.runs)]
+    median = statistics.median(samples)
+
+    print(f"startup: import {args.module} ({args.runs} runs, python {sys.version.split()[0]})")
+    print(f"  interpreter only : {baseline:8.1f} ms")
+    print(f"  with app import  : {median:8.1f} ms (min {min(samples):.1f}, max {max(samples):.1f})")
+    print(f"  app import cost  : {median - baseline:8.1f} ms")
+
+    rows = import_profile(args.module)
+    print(f"\nslowest imports (cumulative) from -X importtime, top {args.top}:")
+    print(f"  {'cumulative ms':>13}  {'self ms':>8}  module")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:13.1f}  {self_us / 1000:8.1f}  {name}")
+
+    # The LLM SDK must never load at import time; see backend.utils.get_model
+    eager = [name.strip() for _, _, name in rows if name.strip().startswith("google.generativeai")]
+    if eager:
+        print("\nFAIL: google.generativeai imported at startup")
+        return 1
+    if args.budget_ms is not None and median - baseline > args.budget_ms:
+        print(f"\nFAIL: app import cost exceeds budget of {args.budget_ms:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,43 @@
 import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, date, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 from pathlib import Path
 
 import plotly.express as px
 import streamlit as st
-from api_client import create_history, get_current_weather, get_forecast, get_user_city, get_ai_summary
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from api_client import create_history, get_current_weather, get_forecast, get_observations, get_user_city, get_ai_summary
 from config import (
     PAGE_TITLE,
     PAGE_ICON,
     LAYOUT,
     MAX_FORECAST_DAYS,
+    FORECAST_FIELDS,
     UNITS,
+    LOCATION_POLL_SECONDS,
+    SESSION_FETCH_WORKERS,
 )
 
+#Background work
+def get_executor() -> ThreadPoolExecutor:
+    """This session's own small pool, so its calls never queue behind other sessions'.
+    Its idle threads exit once the session ends and the pool is garbage collected."""
+    if "executor" not in st.session_state:
+        st.session_state.executor = ThreadPoolExecutor(
+            max_workers=SESSION_FETCH_WORKERS, thread_name_prefix="weather-fetch"
+        )
+    return st.session_state.executor
+
+def submit(fn, *args) -> Future:
+    """Run fn(*args) on the pool with this script run's context, so st.cache_data works."""
+    ctx = get_script_run_ctx()
+    def task():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args)
+    return get_executor().submit(task)
+
 #API Wrappers (cached)
 @st.cache_data(ttl=600)
 def fetch_user_city() -> Optional[str]:
@@ -34,13 +58,54 @@ def fetch_current_weather(city: str, unit: str) -> Optional[Dict]:
 
 @st.cache_data(ttl=60)
 def fetch_forecast(city: str, unit: str) -> Optional[Dict]:
-    """Get 5-day forecast for a given city and unit."""
+    """Get 5-day forecast for a given city and unit, as columns of FORECAST_FIELDS."""
     try:
         api_unit = "imperial" if unit == "Fahrenheit" else "metric"
-        return get_forecast(city, units=api_unit)
+        return get_forecast(city, units=api_unit, fields=FORECAST_FIELDS, fmt="columnar")
     except Exception:
         return None
 
+@st.cache_data(ttl=600)
+def fetch_past_daily(city: str, d_from: date, d_to: date, unit: str) -> List[Dict]:
+    """Recorded observations per local day, shaped like aggregate_forecast rows."""
+    api_unit = "imperial" if unit == "Fahrenheit" else "metric"
+    try:
+        # Hourly rollups are regrouped by local date, the way aggregate_forecast groups the
+        # forecast; the backend works in UTC days, so ask for one extra day on each side
+        data = get_observations(city, (d_from - timedelta(days=1)).isoformat(), (d_to + timedelta(days=1)).isoformat(),
+                                resolution="hour", units=api_unit)
+    except Exception:
+        data = None
+    hourly = {}
+    for p in (data or {}).get("points", []):
+        d = datetime.fromisoformat(p["time"]).astimezone().date()
+        if p.get("temp") is not None and d_from <= d <= d_to:
+            hourly.setdefault(d.isoformat(), []).append(p)
+    daily = {
+        d: {
+            "date": d,
+            "avg_temp": sum(p["temp"] * p["samples"] for p in hours) / sum(p["samples"] for p in hours),
+            "min_temp": min(p["temp_min"] for p in hours),
+            "max_temp": max(p["temp_max"] for p in hours),
+            "samples": sum(p["samples"] for p in hours),
+        }
+        for d, hours in hourly.items()
+    }
+
+    # Days past hourly retention only have daily rollups, which are UTC days; use them for the gaps
+    if len(daily) < (d_to - d_from).days + 1:
+        try:
+            data = get_observations(city, d_from.isoformat(), d_to.isoformat(), resolution="day", units=api_unit)
+        except Exception:
+            data = None
+        for p in (data or {}).get("points", []):
+            if p.get("temp") is not None:
+                daily.setdefault(p["time"][:10], {
+                    "date": p["time"][:10], "avg_temp": p["temp"], "min_temp": p["temp_min"],
+                    "max_temp": p["temp_max"], "samples": p["samples"],
+                })
+    return [daily[d] for d in sorted(daily)]
+
 #Initialization  
 def init_page() -> None:
     st.set_page_config(page_title=PAGE_TITLE, page_icon=PAGE_ICON, layout=LAYOUT)
@@ -48,8 +113,12 @@ def init_page() -> None:
 
 def init_session_state() -> None:
     """Initialize default session variables."""
+    # The IP lookup runs in the background so it never blocks first paint
+    if "default_city_future" not in st.session_state:
+        st.session_state.default_city_future = submit(fetch_user_city)
     defaults = {
-        "default_city": fetch_user_city() or "",
+        "default_city": "",
+        "default_city_applied": False,
         "weather": None,
         "forecast": None,
         "range_daily": [],
@@ -61,9 +130,34 @@ def init_session_state() -> None:
     }
     for key, value in defaults.items():
         st.session_state.setdefault(key, value)
+    apply_default_city()
     st.session_state.last_city = st.session_state.last_city or st.session_state.default_city
 
-#Form   
+def apply_default_city() -> bool:
+    """Use the IP-detected city once it arrives, unless the user already chose one.
+    Returns True if the city input changed."""
+    future = st.session_state.default_city_future
+    if st.session_state.default_city_applied or not future.done():
+        return False
+    st.session_state.default_city_applied = True
+    try:
+        st.session_state.default_city = future.result() or ""
+    except Exception:
+        return False
+    if st.session_state.last_city or not st.session_state.default_city:
+        return False
+    st.session_state.last_city = st.session_state.default_city
+    return True
+
+@st.fragment(run_every=LOCATION_POLL_SECONDS)
+def await_default_city() -> None:
+    """Poll the IP lookup without blocking; once it lands, rerun the page to fill in the city.
+    The rerun also stops the polling, as this fragment is only drawn until then."""
+    if not st.session_state.default_city_future.done():
+        return
+    apply_default_city()
+    st.rerun()
+
 def weather_form() -> Tuple[bool, bool, str, date, date, str]:
     """Weather input form. Returns submission states and inputs."""
     with st.form("weather_form"):
@@ -112,8 +206,12 @@ def handle_current(city: str, date_from: date, date_to: date, unit: str) -> None
         return
     update_last_inputs(city, date_from, date_to, unit)
 
-    with st.spinner("Fetching current weather..."):
-        weather = fetch_current_weather(city, unit)
+    # Both calls are independent, so the wait is the slower of the two
+    with st.spinner("Fetching current weather and forecast..."):
+        weather_future = submit(fetch_current_weather, city, unit)
+        forecast_future = submit(fetch_forecast, city, unit)
+        weather = weather_future.result()
+        forecast = forecast_future.result()
     if not weather:
         st.error("City not found ❌")
         st.session_state.weather = st.session_state.forecast = None
@@ -121,8 +219,7 @@ def handle_current(city: str, date_from: date, date_to: date, unit: str) -> None
 
     st.session_state.weather = weather
     st.session_state.unit = unit  # Update the active unit
-    with st.spinner("Fetching forecast..."):
-        st.session_state.forecast = fetch_forecast(city, unit) or None
+    st.session_state.forecast = forecast or None
     st.session_state.range_daily.clear()
 
 def handle_range(city: str, date_from: date, date_to: date, unit: str) -> None:
@@ -130,22 +227,29 @@ def handle_range(city: str, date_from: date, date_to: date, unit: str) -> None:
         return
     update_last_inputs(city, date_from, date_to, unit)
 
-    with st.spinner("Fetching forecast data..."):
-        forecast = fetch_forecast(city, unit)
-    if not forecast or "list" not in forecast:
-        st.warning("No forecast data available.")
-        st.session_state.range_daily.clear()
-        return
-
     today = date.today()
     eff_from = max(date_from, today)
     eff_to = min(date_to, today + timedelta(days=5))
-    if eff_from > eff_to:
+    if date_from >= today and eff_from > eff_to:
         st.warning("Date range must be within the next 5 days.")
         st.session_state.range_daily.clear()
         return
 
-    st.session_state.range_daily = aggregate_forecast(forecast, eff_from, eff_to)
+    # Past days come from recorded observations, upcoming days from the forecast
+    past_to = min(date_to, today - timedelta(days=1))
+    with st.spinner("Fetching weather data..."):
+        past_future = submit(fetch_past_daily, city, date_from, past_to, unit) if date_from <= past_to else None
+        forecast_future = submit(fetch_forecast, city, unit) if eff_from <= eff_to else None
+        past = past_future.result() if past_future else []
+        forecast = forecast_future.result() if forecast_future else None
+
+    daily = past + (aggregate_forecast(forecast, eff_from, eff_to) if forecast else [])
+    if not daily:
+        st.warning("No weather data available for this range.")
+        st.session_state.range_daily.clear()
+        return
+
+    st.session_state.range_daily = daily
     st.session_state.unit = unit  # Update the active unit
     st.session_state.weather = None # Clear current weather data
 
@@ -156,14 +260,23 @@ def update_last_inputs(city: str, date_from: date, date_to: date, unit: str) ->
     st.session_state.last_unit = unit
 
 #Data Processing  
+def forecast_points(forecast_data: Optional[Dict]) -> Iterator[Tuple]:
+    """Yield (dt, temp) pairs from a columnar or a full OpenWeather forecast."""
+    if not forecast_data:
+        return iter(())
+    if "columns" in forecast_data:
+        columns = forecast_data["columns"]
+        return zip(columns.get("dt", []), columns.get("main.temp", []))
+    return ((e.get("dt"), (e.get("main") or {}).get("temp")) for e in forecast_data.get("list", []))
+
 def aggregate_forecast(forecast_data: Dict, d_from: date, d_to: date) -> List[Dict]:
     """Aggregate 3-hour forecast data into daily averages."""
     daily = {}
-    for entry in forecast_data.get("list", []):
+    for dt, temp in forecast_points(forecast_data):
         try:
-            d = datetime.fromtimestamp(int(entry.get("dt", 0))).date()
+            d = datetime.fromtimestamp(int(dt or 0)).date()
             if d_from <= d <= d_to:
-                daily.setdefault(d.isoformat(), []).append(float(entry["main"]["temp"]))
+                daily.setdefault(d.isoformat(), []).append(float(temp))
         except Exception:
             continue
 
@@ -174,13 +287,11 @@ def aggregate_forecast(forecast_data: Dict, d_from: date, d_to: date) -> List[Di
 
 def process_forecast(forecast_data: Dict) -> List[Dict]:
     """Compute average daily temperature for up to MAX_FORECAST_DAYS."""
-    if not forecast_data or "list" not in forecast_data:
-        return []
     daily_temps = {}
-    for entry in forecast_data["list"]:
+    for dt, temp in forecast_points(forecast_data):
         try:
-            d = datetime.fromtimestamp(int(entry["dt"])).date().isoformat()
-            daily_temps.setdefault(d, []).append(float(entry["main"]["temp"]))
+            d = datetime.fromtimestamp(int(dt)).date().isoformat()
+            daily_temps.setdefault(d, []).append(float(temp))
         except Exception:
             continue
     return [
@@ -353,6 +464,9 @@ def main() -> None:
     else:
         st.info("Please select an option above to view weather data.")
 
+    if not st.session_state.default_city_applied:
+        await_default_city()
+
 
 if __name__ == "__main__":
     st.markdown("Weather App — by Muhammd Muaaz Ulhaq, mmuaazulhaq@gmail.com")
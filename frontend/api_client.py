@@ -3,24 +3,41 @@ from config import (
     API_BASE_URL,
     CURRENT_WEATHER_PATH,
     FORECAST_PATH,
+    OBSERVATIONS_PATH,
     HISTORY_PATH,
+    HISTORY_STATS_PATH,
     WEATHER_RANGE_PATH,
-    USER_LOCATION_URL
+    USER_LOCATION_URL,
+    REQUEST_TIMEOUT,
+    AI_REQUEST_TIMEOUT,
+    LOCATION_TIMEOUT,
 )
 
 def get_current_weather(city, units="metric"):
     url = f"{API_BASE_URL}{CURRENT_WEATHER_PATH}"
-    r = requests.get(url, params={"city": city, "units": units})
+    r = requests.get(url, params={"city": city, "units": units}, timeout=REQUEST_TIMEOUT)
     return r.json() if r.status_code == 200 else None
 
-def get_forecast(city, units="metric"):
+def get_forecast(city, units="metric", fields=None, fmt=None):
     url = f"{API_BASE_URL}{FORECAST_PATH}"
-    r = requests.get(url, params={"city": city, "units": units})
+    params = {"city": city, "units": units}
+    if fields:
+        params["fields"] = ",".join(fields)
+    if fmt:
+        params["format"] = fmt
+    r = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
     return r.json() if r.status_code == 200 else None
 
+def get_observations(city, date_from, date_to, resolution="auto", units="metric"):
+    url = f"{API_BASE_URL}{OBSERVATIONS_PATH}"
+    params = {"city": city, "date_from": date_from, "date_to": date_to, "resolution": resolution, "units": units}
+    r = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
+    r.raise_for_status()
+    return r.json()
+
 def get_user_city():
     try:
-        res = requests.get(USER_LOCATION_URL)
+        res = requests.get(USER_LOCATION_URL, timeout=LOCATION_TIMEOUT)
         if res.status_code == 200:
             return res.json().get("city")
     except Exception:
@@ -29,30 +46,37 @@ def get_user_city():
 
 def get_history():
     url = f"{API_BASE_URL}{HISTORY_PATH}"
-    r = requests.get(url)
+    r = requests.get(url, timeout=REQUEST_TIMEOUT)
     print("STATUS:", r.status_code)
     print("RAW TEXT:", r.text)
     r.raise_for_status()
     return r.json()
 
+def get_history_stats(city=None, bucket="month", date_from=None, date_to=None):
+    url = f"{API_BASE_URL}{HISTORY_STATS_PATH}"
+    params = {"city": city, "bucket": bucket, "date_from": date_from, "date_to": date_to}
+    r = requests.get(url, params={k: v for k, v in params.items() if v is not None}, timeout=REQUEST_TIMEOUT)
+    r.raise_for_status()
+    return r.json()
+
 def create_history(city, date_from, date_to, data=None):
     url = f"{API_BASE_URL}{HISTORY_PATH}"
     payload = {"city": city, "date_from": date_from, "date_to": date_to}
     if data is not None:
         payload["data"] = data
-    r = requests.post(url, json=payload)
+    r = requests.post(url, json=payload, timeout=REQUEST_TIMEOUT)
     r.raise_for_status()
     return r.json()
 
 def get_weather_range(city, date_from, date_to):
     url = f"{API_BASE_URL}{WEATHER_RANGE_PATH}"
-    r = requests.get(url, params={"city": city, "date_from": date_from, "date_to": date_to})
+    r = requests.get(url, params={"city": city, "date_from": date_from, "date_to": date_to}, timeout=REQUEST_TIMEOUT)
     r.raise_for_status()
     return r.json()
 
 def delete_history(record_id):
     url = f"{API_BASE_URL}{HISTORY_PATH}/{record_id}"
-    r = requests.delete(url)
+    r = requests.delete(url, timeout=REQUEST_TIMEOUT)
     r.raise_for_status()
     return r.json()
 
@@ -63,7 +87,7 @@ def update_history(record_id, city=None, unit=None):
         payload["city"] = city
     if unit:
         payload["unit"] = unit
-    r = requests.put(url, json=payload)
+    r = requests.put(url, json=payload, timeout=REQUEST_TIMEOUT)
     r.raise_for_status()
     return r.json()
 
@@ -73,6 +97,6 @@ def get_ai_summary(city, weather, forecast):
         "weather": weather,
         "forecast": forecast,
     }
-    r = requests.post(f"{API_BASE_URL}/weather/summary", json=payload)
+    r = requests.post(f"{API_BASE_URL}/weather/summary", json=payload, timeout=AI_REQUEST_TIMEOUT)
     r.raise_for_status()
     return r.json().get("summary")
\ No newline at end of file
@@ -2,13 +2,25 @@ API_BASE_URL = "https://weather-app-pk45.onrender.com"
 
 CURRENT_WEATHER_PATH = "/weather/current"
 FORECAST_PATH = "/weather/forecast"
+OBSERVATIONS_PATH = "/weather/observations"
 HISTORY_PATH = "/history"
+HISTORY_STATS_PATH = "/history/stats"
 WEATHER_RANGE_PATH = "/weather/range"
 
 USER_LOCATION_URL = "https://ipinfo.io/json"
 
+# (connect, read) timeouts in seconds; AI summaries are slow by nature
+REQUEST_TIMEOUT = (3.05, 15)
+AI_REQUEST_TIMEOUT = (3.05, 60)
+LOCATION_TIMEOUT = 3
+LOCATION_POLL_SECONDS = 0.5
+# Per-session fetch threads: weather and forecast in parallel, plus the IP lookup
+SESSION_FETCH_WORKERS = 3
+
 PAGE_TITLE = "Weather App"
 PAGE_ICON = "⛅"
 LAYOUT = "wide"
 MAX_FORECAST_DAYS = 5
+# Forecast fields the page (charts and AI summary) needs, fetched as parallel arrays
+FORECAST_FIELDS = ("dt", "main.temp", "main.humidity", "wind.speed", "weather.0.description")
 UNITS = ("Celsius", "Fahrenheit")
\ No newline at end of file
@@ -1,5 +1,5 @@
 import streamlit as st
-from api_client import get_history, delete_history, update_history
+from api_client import get_history, get_history_stats, delete_history, update_history
 import json
 import time
 import csv
@@ -198,3 +198,42 @@ if st.session_state.history_loaded:
                             st.rerun()
                         except Exception as e:
                             st.error(f"Failed to delete: {e}")
+
+
+# Aggregate temperature stats over all saved records
+st.subheader("Temperature Stats")
+stats_col1, stats_col2 = st.columns([1, 1])
+with stats_col1:
+    stats_bucket = st.selectbox(
+        "Group by",
+        options=["month", "year", "day", "none"],
+        format_func=lambda b: "All time" if b == "none" else b.capitalize(),
+        key="stats_bucket"
+    )
+with stats_col2:
+    stats_city = st.text_input("City (optional)", key="stats_city")
+
+if st.button("Show Stats"):
+    try:
+        stats = get_history_stats(city=stats_city.strip() or None, bucket=stats_bucket)
+    except Exception as e:
+        st.error(f"Failed to load stats: {e}")
+    else:
+        if not stats:
+            st.info("No temperature data in history yet.")
+        else:
+            st.dataframe(
+                [
+                    {
+                        "City": row["city"],
+                        "Period": row["bucket"],
+                        "Unit": row["unit"],
+                        "Records": row["records"],
+                        "Avg Temp": fmt(row["avg_temp"]),
+                        "Min Temp": fmt(row["min_temp"]),
+                        "Max Temp": fmt(row["max_temp"]),
+                    }
+                    for row in stats
+                ],
+                hide_index=True
+            )